@@ -1,6 +1,7 @@
 # This file is a part of FileStreamBot
 
 
+import heapq
 from ..vars import Var
 from hydrogram import Client
 
@@ -23,5 +24,32 @@ StreamBot = Client(
     no_updates=no_updates
 )
 
+
+class WorkLoads(dict):
+    """
+    A dict of client index to the number of files it is currently streaming.
+    Every assignment is also pushed to a min-heap, so the least loaded client
+    can be picked without scanning all clients. Outdated heap entries are
+    dropped lazily when they reach the top.
+    """
+    def __init__(self):
+        super().__init__()
+        self._heap = []
+
+    def __setitem__(self, index, load):
+        super().__setitem__(index, load)
+        heapq.heappush(self._heap, (load, index))
+        if len(self._heap) > 4 * len(self):
+            self._heap = [(load, index) for index, load in self.items()]
+            heapq.heapify(self._heap)
+
+    def least_loaded(self):
+        while self._heap:
+            load, index = self._heap[0]
+            if self.get(index) == load:
+                return index
+            heapq.heappop(self._heap)
+        raise ValueError("no clients available")
+
 multi_clients = {}
-work_loads = {}
+work_loads = WorkLoads()
@@ -6,7 +6,7 @@ from WebStreamer.utils.Translation import Language
 from WebStreamer.bot import StreamBot, multi_clients
 from WebStreamer.utils.bot_utils import gen_link, validate_user
 from WebStreamer.utils.database import Database
-from WebStreamer.utils.file_properties import get_file_ids, get_file_info
+from WebStreamer.utils.file_properties import fetch_file_ids, get_file_info
 from WebStreamer.vars import Var
 from hydrogram import filters, Client
 from hydrogram.errors import FloodWait
@@ -37,8 +37,12 @@ async def private_receive_handler(bot: Client, message: Message):
         if not (ptype):
             return await message.reply_text(lang.LINK_LIMIT_EXCEEDED)
 
-        inserted_id=await db.add_file(get_file_info(message))
-        await get_file_ids(False, inserted_id, multi_clients)
+        file_info=get_file_info(message)
+        inserted_id, file_ids = await asyncio.gather(
+            db.add_file(file_info),
+            fetch_file_ids(file_info["file_id"], multi_clients)
+        )
+        await db.update_file_ids(inserted_id, file_ids)
         reply_markup, Stream_Text = await gen_link(m=message, _id=inserted_id, name=[StreamBot.username, StreamBot.fname])
         await message.reply_text(
             text=Stream_Text,
@@ -2,7 +2,6 @@
 # Thanks to Eyaadh <https://github.com/eyaadh>
 
 import time
-import math
 import logging
 import mimetypes
 import traceback
@@ -69,20 +68,23 @@ async def stream_handler(request: web.Request):
 
 class_cache = {}
 
+# largest limit upload.GetFile accepts, fewer round trips per streamed byte
+CHUNK_SIZE = 1024 * 1024
+
 async def media_streamer(request: web.Request, db_id: str):
     range_header = request.headers.get("Range", 0)
     
-    index = min(work_loads, key=work_loads.get)
+    index = work_loads.least_loaded()
     faster_client = multi_clients[index]
     
     if Var.MULTI_CLIENT:
-        logging.info(f"Client {index} is now serving {request.headers.get('X-FORWARDED-FOR',request.remote)}")
+        logging.info("Client %s is now serving %s", index, request.headers.get('X-FORWARDED-FOR',request.remote))
 
     if faster_client in class_cache:
         tg_connect = class_cache[faster_client]
-        logging.debug(f"Using cached ByteStreamer object for client {index}")
+        logging.debug("Using cached ByteStreamer object for client %s", index)
     else:
-        logging.debug(f"Creating new ByteStreamer object for client {index}")
+        logging.debug("Creating new ByteStreamer object for client %s", index)
         tg_connect = utils.ByteStreamer(faster_client)
         class_cache[faster_client] = tg_connect
     logging.debug("before calling get_file_properties")
@@ -106,7 +108,7 @@ async def media_streamer(request: web.Request, db_id: str):
             headers={"Content-Range": f"bytes */{file_size}"},
         )
 
-    chunk_size = 1024 * 1024
+    chunk_size = CHUNK_SIZE
     until_bytes = min(until_bytes, file_size - 1)
 
     offset = from_bytes - (from_bytes % chunk_size)
@@ -114,7 +116,7 @@ async def media_streamer(request: web.Request, db_id: str):
     last_part_cut = until_bytes % chunk_size + 1
 
     req_length = until_bytes - from_bytes + 1
-    part_count = math.ceil(until_bytes / chunk_size) - math.floor(offset / chunk_size)
+    part_count = until_bytes // chunk_size - offset // chunk_size + 1
     body = tg_connect.yield_file(
         file_id, index, offset, first_part_cut, last_part_cut, part_count, chunk_size
     )
@@ -1,6 +1,8 @@
 # This file is a part of FileStreamBot
 
 from __future__ import annotations
+import asyncio
+import logging
 from hydrogram.errors import UserNotParticipant
 from hydrogram.enums.parse_mode import ParseMode
 from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
@@ -78,6 +80,22 @@ async def is_user_exist(message: Message):
             f"**Nᴇᴡ Usᴇʀ Jᴏɪɴᴇᴅ:** \n\n__Mʏ Nᴇᴡ Fʀɪᴇɴᴅ__ [{message.from_user.first_name}](tg://user?id={message.from_user.id}) __Sᴛᴀʀᴛᴇᴅ Yᴏᴜʀ Bᴏᴛ !!__"
         )
 
+# registrations still running after validate_user returned early, asyncio only keeps weak references to tasks
+registering_users = set()
+
+def leave_registration(task: asyncio.Task | None, user_id: int):
+    """Lets a registration nobody will await finish in the background, logging it if it fails"""
+    if task is None:
+        return
+
+    def registration_done(task: asyncio.Task):
+        registering_users.discard(task)
+        if not task.cancelled() and task.exception():
+            logging.error("Failed registering user %s", user_id, exc_info=task.exception())
+
+    registering_users.add(task)
+    task.add_done_callback(registration_done)
+
 async def is_user_accepted_tos(message: Message) -> bool:
     user=await db.get_user(message.from_user.id)
     if not ("agreed_to_tos" in user) or not (user["agreed_to_tos"]):
@@ -98,18 +116,26 @@ async def is_allowed(message: Message):
 async def validate_user(message: Message, lang=None) -> bool:
     if not await is_allowed(message):
         return False
-    await is_user_exist(message)
     if Var.TOS:
+        await is_user_exist(message)
         if not await is_user_accepted_tos(message):
             return False
+        user_exist = None
+    else:
+        # nothing below reads the user document, so registering runs alongside the checks
+        user_exist = asyncio.create_task(is_user_exist(message))
 
     if not lang:
         lang = Language(message)
     if await is_user_banned(message, lang):
+        leave_registration(user_exist, message.from_user.id)
         return False
     if Var.FORCE_UPDATES_CHANNEL:
         if not await is_user_joined(message,lang):
-            return False
+            leave_registration(user_exist, message.from_user.id)
+        return False
+    if user_exist is not None:
+        await user_exist
     return True
 
 def file_format(file_id: str | FileId) -> str:
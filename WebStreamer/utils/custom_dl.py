@@ -2,35 +2,108 @@
 
 import asyncio
 import logging
-from typing import Dict, Union
+from collections import OrderedDict, defaultdict, deque
+from typing import AsyncGenerator, Awaitable, Callable, Union
 from WebStreamer.bot import work_loads
+from WebStreamer.vars import Var
 from hydrogram import Client, utils, raw
 from .file_properties import get_file_ids
 from hydrogram.session import Session, Auth
 from hydrogram.errors import AuthBytesInvalid
 from hydrogram.file_id import FileId, FileType, ThumbnailSource
 
+# chunk requests are never cancelled, a cancelled Session.invoke leaves its response
+# stored in the session for good. They are kept here until they finish
+inflight_requests = set()
+
+# requests still running for streams that already ended, per session. While a session
+# has MAX_ORPHANED_REQUESTS of them, its streams stop reading ahead and fetch one chunk at a time
+orphaned_requests = defaultdict(set)
+MAX_ORPHANED_REQUESTS = 4 * Var.PREFETCH_COUNT
+
+
+def forget_request(task: asyncio.Task) -> None:
+    inflight_requests.discard(task)
+    if not task.cancelled():
+        task.exception()
+
+
+class ChunkPrefetcher:
+    def __init__(
+        self,
+        session: Session,
+        fetch: Callable[[int], Awaitable],
+        offset: int,
+        part_count: int,
+        chunk_size: int,
+    ):
+        """
+        Async iterator over the results of fetch for part_count consecutive chunks starting at offset, in order.
+        Up to Var.PREFETCH_COUNT requests are kept in flight on the session so the next chunks download
+        while the current one is sent, the first ones are started right away.
+        Requests left over when the stream ends are allowed to finish and their results are dropped.
+        """
+        self.session = session
+        self.fetch = fetch
+        self.offset = offset
+        self.part_count = part_count
+        self.chunk_size = chunk_size
+        self.pending = deque()
+        self.fill()
+
+    def fill(self) -> None:
+        if len(orphaned_requests[self.session]) < MAX_ORPHANED_REQUESTS:
+            depth = max(Var.PREFETCH_COUNT, 1)
+        else:
+            depth = 1
+        while self.part_count and len(self.pending) < depth:
+            task = asyncio.create_task(self.fetch(self.offset))
+            inflight_requests.add(task)
+            task.add_done_callback(forget_request)
+            self.pending.append(task)
+            self.offset += self.chunk_size
+            self.part_count -= 1
+
+    def close(self) -> None:
+        """
+        Hands the requests nobody will read over to orphaned_requests until they finish.
+        """
+        orphaned = orphaned_requests[self.session]
+        for task in self.pending:
+            if not task.done():
+                orphaned.add(task)
+                task.add_done_callback(orphaned.discard)
+        self.pending.clear()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        self.fill()
+        if not self.pending:
+            raise StopAsyncIteration
+        return await asyncio.shield(self.pending.popleft())
+
 
 class ByteStreamer:
     def __init__(self, client: Client):
         """A custom class that holds the cache of a specific client and class functions.
         attributes:
             client: the client that the cache is for.
-            cached_file_ids: a dict of cached file IDs.
+            cached_file_ids: a LRU cache of file IDs, bounded by Var.CACHE_SIZE.
             cached_file_properties: a dict of cached file properties.
         
         functions:
             generate_file_properties: returns the properties for a media of a specific message contained in Tuple.
             generate_media_session: returns the media session for the DC that contains the media file.
+            cut_chunk: returns the part of a chunk that belongs to the requested range.
             yield_file: yield a file from telegram servers for streaming.
             
         This is a modified version of the <https://github.com/eyaadh/megadlbot_oss/blob/master/mega/telegram/utils/custom_download.py>
         Thanks to Eyaadh <https://github.com/eyaadh>
         """
-        self.clean_timer = 30 * 60
         self.client: Client = client
-        self.cached_file_ids: Dict[str, FileId] = {}
-        asyncio.create_task(self.clean_cache())
+        self.cached_file_ids: "OrderedDict[str, FileId]" = OrderedDict()
 
     async def get_file_properties(self, db_id: str, multi_clients) -> FileId:
         """
@@ -40,8 +113,10 @@ class ByteStreamer:
         """
         if not db_id in self.cached_file_ids:
             logging.debug("Before Calling generate_file_properties")
-            await self.generate_file_properties(db_id, multi_clients)
-            logging.debug(f"Cached file properties for file with ID {db_id}")
+            file_id = await self.generate_file_properties(db_id, multi_clients)
+            logging.debug("Cached file properties for file with ID %s", db_id)
+            return file_id
+        self.cached_file_ids.move_to_end(db_id)
         return self.cached_file_ids[db_id]
     
     async def generate_file_properties(self, db_id: str, multi_clients) -> FileId:
@@ -51,10 +126,12 @@ class ByteStreamer:
         """
         logging.debug("Before calling get_file_ids")
         file_id = await get_file_ids(self.client, db_id, multi_clients)
-        logging.debug(f"Generated file ID and Unique ID for file with ID {db_id}")
+        logging.debug("Generated file ID and Unique ID for file with ID %s", db_id)
         self.cached_file_ids[db_id] = file_id
-        logging.debug(f"Cached media file with ID {db_id}")
-        return self.cached_file_ids[db_id]
+        if len(self.cached_file_ids) > Var.CACHE_SIZE:
+            self.cached_file_ids.popitem(last=False)
+        logging.debug("Cached media file with ID %s", db_id)
+        return file_id
 
     async def generate_media_session(self, client: Client, file_id: FileId) -> Session:
         """
@@ -77,26 +154,35 @@ class ByteStreamer:
                 )
                 await media_session.start()
 
-                for _ in range(6):
-                    exported_auth = await client.invoke(
-                        raw.functions.auth.ExportAuthorization(dc_id=file_id.dc_id)
+                try:
+                    imported = await self.import_authorization(
+                        client, media_session, file_id.dc_id
                     )
-
-                    try:
-                        await media_session.invoke(
-                            raw.functions.auth.ImportAuthorization(
-                                id=exported_auth.id, bytes=exported_auth.bytes
-                            )
+                    if not imported:
+                        # the first import was rejected, retry twice at once before going one at a time
+                        results = await asyncio.gather(
+                            *(
+                                self.import_authorization(client, media_session, file_id.dc_id)
+                                for _ in range(2)
+                            ),
+                            return_exceptions=True,
                         )
-                        break
-                    except AuthBytesInvalid:
-                        logging.debug(
-                            f"Invalid authorization bytes for DC {file_id.dc_id}"
-                        )
-                        continue
-                else:
+                        imported = True in results
+                        if not imported:
+                            for result in results:
+                                if isinstance(result, BaseException):
+                                    raise result
+                    if not imported:
+                        for _ in range(3):
+                            if await self.import_authorization(
+                                client, media_session, file_id.dc_id
+                            ):
+                                break
+                        else:
+                            raise AuthBytesInvalid
+                except BaseException:
                     await media_session.stop()
-                    raise AuthBytesInvalid
+                    raise
             else:
                 media_session = Session(
                     client,
@@ -106,12 +192,31 @@ class ByteStreamer:
                     is_media=True,
                 )
                 await media_session.start()
-            logging.debug(f"Created media session for DC {file_id.dc_id}")
+            logging.debug("Created media session for DC %s", file_id.dc_id)
             client.media_sessions[file_id.dc_id] = media_session
         else:
-            logging.debug(f"Using cached media session for DC {file_id.dc_id}")
+            logging.debug("Using cached media session for DC %s", file_id.dc_id)
         return media_session
 
+    @staticmethod
+    async def import_authorization(client: Client, media_session: Session, dc_id: int) -> bool:
+        """
+        Exports the authorization of the client and imports it into the media session of another DC.
+        returns False if the DC rejected the authorization bytes.
+        """
+        exported_auth = await client.invoke(
+            raw.functions.auth.ExportAuthorization(dc_id=dc_id)
+        )
+        try:
+            await media_session.invoke(
+                raw.functions.auth.ImportAuthorization(
+                    id=exported_auth.id, bytes=exported_auth.bytes
+                )
+            )
+        except AuthBytesInvalid:
+            logging.debug("Invalid authorization bytes for DC %s", dc_id)
+            return False
+        return True
 
     @staticmethod
     async def get_location(file_id: FileId) -> Union[raw.types.InputPhotoFileLocation,
@@ -119,7 +224,12 @@ class ByteStreamer:
                                                      raw.types.InputPeerPhotoFileLocation,]:
         """
         Returns the file location for the media file.
+        The location is cached on the FileId, which itself lives in cached_file_ids.
         """
+        location = getattr(file_id, "location", None)
+        if location is not None:
+            return location
+
         file_type = file_id.file_type
 
         if file_type == FileType.CHAT_PHOTO:
@@ -156,8 +266,30 @@ class ByteStreamer:
                 file_reference=file_id.file_reference,
                 thumb_size=file_id.thumbnail_size,
             )
+        setattr(file_id, "location", location)
         return location
 
+    @staticmethod
+    def cut_chunk(
+        chunk: bytes,
+        current_part: int,
+        part_count: int,
+        first_part_cut: int,
+        last_part_cut: int,
+    ) -> memoryview:
+        """
+        Returns the part of a chunk that belongs to the requested range.
+        memoryview slices let aiohttp write the cut parts without copying them.
+        """
+        chunk_view = memoryview(chunk)
+        if part_count == 1:
+            return chunk_view[first_part_cut:last_part_cut]
+        elif current_part == 1:
+            return chunk_view[first_part_cut:]
+        elif current_part == part_count:
+            return chunk_view[:last_part_cut]
+        return chunk_view
+
     async def yield_file(
         self,
         file_id: FileId,
@@ -167,18 +299,19 @@ class ByteStreamer:
         last_part_cut: int,
         part_count: int,
         chunk_size: int,
-    ) -> Union[str, None]:
+    ) -> AsyncGenerator[memoryview, None]:
         """
-        Custom generator that yields the bytes of the media file.
+        Custom generator that yields the bytes of the media file as memoryviews.
         Modded from <https://github.com/eyaadh/megadlbot_oss/blob/master/mega/telegram/utils/custom_download.py#L20>
         Thanks to Eyaadh <https://github.com/eyaadh>
         """
         client = self.client
         work_loads[index] += 1
-        logging.debug(f"Starting to yielding file with client {index}.")
+        logging.debug("Starting to yielding file with client %s.", index)
         media_session = await self.generate_media_session(client, file_id)
 
         current_part = 1
+        chunks = None
 
         location = await self.get_location(file_id)
 
@@ -189,42 +322,29 @@ class ByteStreamer:
                 ),
             )
             if isinstance(r, raw.types.upload.File):
-                while True:
-                    chunk = r.bytes
-                    if not chunk:
-                        break
-                    elif part_count == 1:
-                        yield chunk[first_part_cut:last_part_cut]
-                    elif current_part == 1:
-                        yield chunk[first_part_cut:]
-                    elif current_part == part_count:
-                        yield chunk[:last_part_cut]
-                    else:
-                        yield chunk
-
-                    current_part += 1
-                    offset += chunk_size
-
-                    if current_part > part_count:
-                        break
-
-                    r = await media_session.invoke(
+                chunks = ChunkPrefetcher(
+                    media_session,
+                    lambda next_offset: media_session.invoke(
                         raw.functions.upload.GetFile(
-                            location=location, offset=offset, limit=chunk_size
+                            location=location, offset=next_offset, limit=chunk_size
                         ),
-                    )
+                    ),
+                    offset + chunk_size,
+                    part_count - 1,
+                    chunk_size,
+                )
+                if r.bytes:
+                    yield self.cut_chunk(r.bytes, current_part, part_count, first_part_cut, last_part_cut)
+                    current_part += 1
+                    async for r in chunks:
+                        if not r.bytes:
+                            break
+                        yield self.cut_chunk(r.bytes, current_part, part_count, first_part_cut, last_part_cut)
+                        current_part += 1
         except (TimeoutError, AttributeError):
             pass
         finally:
-            logging.debug(f"Finished yielding file with {current_part} parts.")
+            if chunks is not None:
+                chunks.close()
+            logging.debug("Finished yielding file with %s parts.", current_part)
             work_loads[index] -= 1
-
-    
-    async def clean_cache(self) -> None:
-        """
-        function to clean the cache to reduce memory usage
-        """
-        while True:
-            await asyncio.sleep(self.clean_timer)
-            self.cached_file_ids.clear()
-            logging.debug("Cleaned the cache")
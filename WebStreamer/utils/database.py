@@ -9,8 +9,13 @@ from WebStreamer.server.exceptions import FIleNotFound
 from WebStreamer.vars import Var
 
 class Database:
+    # every module creates its own Database, they all share one connection pool per uri
+    _clients = {}
+
     def __init__(self, uri, database_name):
-        self._client = motor.motor_asyncio.AsyncIOMotorClient(uri)
+        if uri not in Database._clients:
+            Database._clients[uri] = motor.motor_asyncio.AsyncIOMotorClient(uri, maxPoolSize=50, minPoolSize=5)
+        self._client = Database._clients[uri]
         self.db = self._client[database_name]
         self.col = self.db.users
         self.black = self.db.blacklist
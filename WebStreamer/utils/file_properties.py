@@ -17,8 +17,7 @@ async def get_file_ids(client: Client | bool, db_id: str, multi_clients) -> Opti
     file_info = await db.get_file(db_id)
     if (not "file_ids" in file_info) or not client:
         logging.debug("Storing file_id of all clients in DB")
-        log_msg=await send_file(StreamBot, file_info['file_id'])
-        await db.update_file_ids(db_id, await update_file_id(log_msg.id, multi_clients))
+        await db.update_file_ids(db_id, await fetch_file_ids(file_info['file_id'], multi_clients))
         logging.debug("Stored file_id of all clients in DB")
         if not client:
             return
@@ -115,5 +114,10 @@ async def update_file_id(msg_id, multi_clients):
 
     return file_ids
 
+async def fetch_file_ids(file_id: str, multi_clients) -> dict:
+    """Sends the file to BIN_CHANNEL and returns the file_id of it for every client"""
+    log_msg=await send_file(StreamBot, file_id)
+    return await update_file_id(log_msg.id, multi_clients)
+
 async def send_file(client: Client, file_id: str):
     return await client.send_cached_media(Var.BIN_CHANNEL, file_id)
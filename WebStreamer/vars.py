@@ -19,6 +19,8 @@ class Var(object):
     PORT = int(environ.get("PORT", 8080))
     BIND_ADDRESS = str(environ.get("WEB_SERVER_BIND_ADDRESS", "0.0.0.0"))
     PING_INTERVAL = int(environ.get("PING_INTERVAL", "1200"))  # 20 minutes
+    CACHE_SIZE = int(environ.get("CACHE_SIZE", "4096"))  # max cached file ids per client
+    PREFETCH_COUNT = int(environ.get("PREFETCH_COUNT", "4"))  # chunk requests kept in flight per stream
     HAS_SSL = str(environ.get("HAS_SSL", "0").lower()) in ("1", "true", "t", "yes", "y")
     NO_PORT = str(environ.get("NO_PORT", "0").lower()) in ("1", "true", "t", "yes", "y")
     FQDN = str(environ.get("FQDN", BIND_ADDRESS))